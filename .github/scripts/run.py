@@ -1,47 +1,175 @@
+import concurrent.futures
+import functools
 import os
+import re
 import shutil
-import toml
+import tomllib
 import subprocess
 import tempfile
 
+# rtoml is a native TOML reader/writer; fall back to stdlib tomllib plus tomli_w without it
+try:
+    import rtoml
+except ImportError:
+    rtoml = None
+    import tomli_w
+
+# Absolute path so subprocess can use posix_spawn, which requires the executable's directory
+GIT = shutil.which("git") or "git"
+
+# Optional persistent directory holding the zed mirror and cargo's target dir across runs
+CACHE_DIR = os.environ.get("CACHE_DIR")
+
+DEFAULT_CARGO_TARGET_DIR = os.path.join(
+    CACHE_DIR or os.path.join(os.path.expanduser("~"), ".cache", "gpui-clone"), "target"
+)
+
+# Only put the workspace on tmpfs when it has room for the zed checkout and the upload repo
+TMPFS_DIR = "/dev/shm"
+TMPFS_MIN_FREE_BYTES = 4 * 1024 ** 3
+
+# Index settings for staging a full snapshot; manyFiles turns on the untracked cache
+MANY_FILES_CONFIG = ("-c", "feature.manyFiles=true")
+
+# Matched against a bare file name: README*/LICENSE*/... prefixes or a .md/.txt suffix
+PRUNE_FILE_RE = re.compile(
+    rb"(?:readme|license|changelog|contributing|dockerfile)|.*\.(?:md|txt)$", re.I
+)
+
 def read_toml(path):
-    with open(path, 'r') as f:
-        return toml.load(f)
+    if rtoml is not None:
+        with open(path, 'r') as f:
+            return rtoml.load(f)
+    with open(path, 'rb') as f:
+        return tomllib.load(f)
 
 def write_toml(path, data):
     with open(path, 'w') as f:
-        toml.dump(data, f)
+        if rtoml is not None:
+            rtoml.dump(data, f)
+        else:
+            f.write(tomli_w.dumps(data))
+
+def run_git(*args, **kwargs):
+    """
+    Runs git via the posix_spawn fast path: no fd closing and no cwd (use -C instead).
+    """
+    return subprocess.run([GIT, *args], close_fds=False, **kwargs)
+
+def get_work_root():
+    """
+    Returns the tmpfs mount for the temporary workspace when it is usable, otherwise None
+    so tempfile falls back to its default location.
+    """
+    if not os.path.isdir(TMPFS_DIR) or not os.access(TMPFS_DIR, os.W_OK):
+        return None
+    stats = os.statvfs(TMPFS_DIR)
+    if stats.f_bavail * stats.f_frsize < TMPFS_MIN_FREE_BYTES:
+        return None
+    return TMPFS_DIR
+
+def update_mirror(repo_url, mirror_dir):
+    """
+    Creates or refreshes a shallow bare mirror of the default branch of repo_url.
+    """
+    if os.path.isdir(mirror_dir):
+        print(f"Updating cached mirror {mirror_dir}...")
+        head_ref = run_git(
+            "-C", mirror_dir, "symbolic-ref", "HEAD",
+            capture_output=True,
+            check=True
+        ).stdout.decode("ascii").strip()
+        run_git(
+            "-C", mirror_dir, "-c", "protocol.version=2", "fetch",
+            "--depth=1", "--no-tags", "origin", f"+{head_ref}:{head_ref}",
+            check=True,
+        )
+    else:
+        print(f"Mirroring {repo_url} into {mirror_dir}...")
+        os.makedirs(os.path.dirname(mirror_dir), exist_ok=True)
+        # No blob filter: local clones from the mirror need every blob at the tip
+        run_git(
+            "-c", "protocol.version=2", "clone",
+            "--bare", "--depth=1", "--single-branch", "--no-tags",
+            repo_url, mirror_dir,
+            check=True,
+        )
 
 def robust_copy_tree(src, dst):
     """
     Recursively copies a directory tree, handling symlinks by copying the target file/dir
     (dereferencing), and ignoring errors for missing files (dangling links).
     """
-    if not os.path.exists(dst):
-        os.makedirs(dst)
+    try:
+        # copytree walks with os.scandir and copies via the platform fast-copy path
+        shutil.copytree(src, dst, symlinks=False, dirs_exist_ok=True)
+    except shutil.Error as e:
+        # Skip dangling symlinks or unreadable files; everything else was copied
+        for s, _, why in e.args[0]:
+            print(f"Skipping {s}: {why}")
+
+def remove_trees(paths):
+    """
+    Removes independent directory trees concurrently, ignoring paths that are already gone.
+    """
+    def remove_tree(path):
+        try:
+            shutil.rmtree(path)
+        except FileNotFoundError:
+            pass
 
-    for item in os.listdir(src):
-        s = os.path.join(src, item)
-        d = os.path.join(dst, item)
+    # rmtree is bound by unlink/rmdir syscalls, so threads overlap well despite the GIL
+    max_workers = min(32, (os.cpu_count() or 1) * 4)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(remove_tree, paths))
 
-        try:
-            if os.path.isdir(s):
-                robust_copy_tree(s, d)
+def walk_scandir(top):
+    """
+    Top-down directory walk built on os.scandir, yielding (dir_path, entries). As with
+    os.walk's dirs list, dropping an entry from entries stops the walk descending into it.
+    """
+    with os.scandir(top) as it:
+        entries = list(it)
+    yield top, entries
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield from walk_scandir(entry.path)
+
+def remove_stale_paths(src, dst):
+    """
+    Removes files and directories in dst that do not exist in src, leaving .git, .github
+    and the root README.md untouched.
+    """
+    for root, entries in walk_scandir(dst):
+        rel_root = "" if root == dst else os.path.relpath(root, dst)
+        descend = []
+        for entry in entries:
+            rel_path = os.path.join(rel_root, entry.name)
+
+            # Skip .git, .github directory content and README.md in the root
+            if (entry.name == ".git" or
+                rel_path.startswith(".github") or
+                rel_path.lower() == "readme.md"):
+                continue
+
+            if os.path.exists(os.path.join(src, rel_path)):
+                descend.append(entry)
+            elif entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path)
             else:
-                # shutil.copy2 follows symlinks by default (dereferences them)
-                shutil.copy2(s, d)
-        except (FileNotFoundError, OSError) as e:
-            # Skip dangling symlinks or unreadable files
-            print(f"Skipping {s}: {e}")
-            continue
+                os.remove(entry.path)
+
+        entries[:] = descend
 
 def get_workspace_dependencies(root_cargo_toml):
     return root_cargo_toml.get("workspace", {}).get("dependencies", {})
 
+@functools.lru_cache(maxsize=None)
 def get_crate_dependencies(crate_path):
+    # crates/ entries are not guaranteed to be crates: stray files or dirs without a manifest
     cargo_path = os.path.join(crate_path, "Cargo.toml")
     if not os.path.exists(cargo_path):
-        return []
+        return ()
     
     data = read_toml(cargo_path)
     deps = []
@@ -57,12 +185,11 @@ def get_crate_dependencies(crate_path):
             if "build-dependencies" in data["target"][target]:
                 deps.extend(data["target"][target]["build-dependencies"].keys())
                 
-    return deps
+    # Cached, so hand out an immutable copy
+    return tuple(deps)
 
 def resolve_local_dependencies(start_crate, root_path, workspace_deps):
-    to_visit = [start_crate]
-    visited = set()
-    local_crates = set()
+    existing_crates = set(os.listdir(os.path.join(root_path, "crates")))
 
     dep_name_to_path = {}
     for name, defn in workspace_deps.items():
@@ -72,49 +199,68 @@ def resolve_local_dependencies(start_crate, root_path, workspace_deps):
                 crate_name = os.path.basename(path)
                 dep_name_to_path[name] = crate_name
 
-    while to_visit:
-        current_crate = to_visit.pop()
-        if current_crate in visited:
-            continue
-        visited.add(current_crate)
-        local_crates.add(current_crate)
-
-        crate_path = os.path.join(root_path, "crates", current_crate)
-        deps = get_crate_dependencies(crate_path)
-        
-        for dep in deps:
-            if dep in dep_name_to_path:
-                next_crate = dep_name_to_path[dep]
-                if next_crate not in visited:
-                    to_visit.append(next_crate)
-
-    return local_crates
+    # Adjacency list of local crates, filled in one frontier at a time. A crate is
+    # only expanded when first reached, so each Cargo.toml is parsed exactly once.
+    crate_graph = {}
+    frontier = [start_crate]
+    # Manifests within a frontier are independent, so read and parse them concurrently
+    with concurrent.futures.ThreadPoolExecutor(max_workers=16) as executor:
+        while frontier:
+            crate_paths = [os.path.join(root_path, "crates", crate) for crate in frontier]
+            for crate, deps in zip(frontier, executor.map(get_crate_dependencies, crate_paths)):
+                crate_graph[crate] = {
+                    dep_name_to_path[dep]
+                    for dep in deps
+                    if dep in dep_name_to_path and dep_name_to_path[dep] in existing_crates
+                }
+
+            frontier = list({dep for crate in frontier for dep in crate_graph[crate]} - crate_graph.keys())
+
+    return set(crate_graph)
 
 def main():
     # Use a temporary directory for the entire workspace
-    with tempfile.TemporaryDirectory() as work_dir:
+    with tempfile.TemporaryDirectory(dir=get_work_root()) as work_dir:
         print(f"Created temporary workspace at: {work_dir}")
         
         # Define paths within the temporary directory
         SOURCE_DIR = os.path.join(work_dir, "source", "zed")
-        OUTPUT_DIR = os.path.join(work_dir, "output", "zed")
+        # The clone is pruned in place; only the surviving files get copied to UPLOAD_DIR
+        OUTPUT_DIR = SOURCE_DIR
         UPLOAD_DIR = os.path.join(work_dir, "upload", "gpui-clone")
 
         # 0. Setup and Clone source
         zed_repo_url = "https://github.com/zed-industries/zed.git"
         
-        print(f"Cloning {zed_repo_url} into {SOURCE_DIR}...")
         # Ensure parent dir exists
         os.makedirs(os.path.dirname(SOURCE_DIR), exist_ok=True)
-        subprocess.run(["git", "clone", "--depth", "1", zed_repo_url, SOURCE_DIR], check=True)
-
-        # 1. Copy project
-        print(f"Copying {SOURCE_DIR} to {OUTPUT_DIR}...")
-        # No need to check exists for new temp dir, but good practice
-        if os.path.exists(OUTPUT_DIR):
-            shutil.rmtree(OUTPUT_DIR)
-        
-        robust_copy_tree(SOURCE_DIR, OUTPUT_DIR)
+        if CACHE_DIR:
+            # Refresh the cached mirror, then clone it locally; the clone is pruned in
+            # place (including .git), so the mirror itself must stay untouched
+            zed_mirror = os.path.join(CACHE_DIR, "zed.git")
+            update_mirror(zed_repo_url, zed_mirror)
+            print(f"Cloning {zed_mirror} into {SOURCE_DIR}...")
+            run_git("clone", zed_mirror, SOURCE_DIR, check=True)
+        else:
+            print(f"Cloning {zed_repo_url} into {SOURCE_DIR}...")
+            run_git(
+                "-c", "protocol.version=2", "clone",
+                "--depth=1", "--single-branch", "--filter=blob:none", "--no-tags",
+                zed_repo_url, SOURCE_DIR,
+                check=True,
+            )
+
+        # 1. Get source commit hash (before .git is pruned along with the rest)
+        try:
+            result = run_git(
+                "-C", SOURCE_DIR, "rev-parse", "--short", "HEAD",
+                capture_output=True, 
+                check=True
+            )
+            source_commit = result.stdout.decode("ascii").strip()
+        except subprocess.CalledProcessError:
+            source_commit = "unknown"
+            print("Warning: Could not get source commit hash.")
 
         # 2. Analyze dependencies
         print("Analyzing dependencies...")
@@ -125,95 +271,84 @@ def main():
         needed_crates = resolve_local_dependencies("gpui", OUTPUT_DIR, workspace_deps)
         print(f"Identified {len(needed_crates)} required local crates: {sorted(list(needed_crates))}")
 
-        # 3. Clean crates directory
+        # 3. Clean remaining crates (remove README, LICENSE, symlinks, docs, etc.)
         print("Cleaning crates directory...")
-        crates_dir = os.path.join(OUTPUT_DIR, "crates")
-        for item in os.listdir(crates_dir):
-            item_path = os.path.join(crates_dir, item)
-            if os.path.isdir(item_path):
-                if item not in needed_crates:
-                    shutil.rmtree(item_path)
-
-        # Clean remaining crates (remove README, LICENSE, symlinks, etc.)
-        if os.path.exists(crates_dir):
-            for root, dirs, files in os.walk(crates_dir):
-                for d in ["docs"]:
-                    if d in dirs:
-                        shutil.rmtree(os.path.join(root, d))
-                        dirs.remove(d)
-                
-                for f in files:
-                    file_path = os.path.join(root, f)
-                    
-                    # Check for symlinks
-                    if os.path.islink(file_path):
-                         try:
-                            os.remove(file_path)
-                         except OSError:
-                            pass
-                         continue
-
-                    lower_f = f.lower()
-                    # Special case: gpui needs its README.md for compilation
-                    if lower_f == "readme.md" and "gpui" in root.split(os.sep):
-                        continue
-
-                    if (lower_f.startswith("readme") or 
-                        lower_f.startswith("license") or 
-                        lower_f.startswith("changelog") or 
-                        lower_f.startswith("contributing") or
-                        lower_f.startswith("dockerfile") or
-                        lower_f.endswith(".md") or
-                        lower_f.endswith(".txt")):
-                        try:
-                            os.remove(file_path)
-                        except OSError:
-                            pass
-
-        # 4. Clean tooling and extensions
-        print("Cleaning tooling and extensions...")
-        tooling_dir = os.path.join(OUTPUT_DIR, "tooling")
-        if os.path.exists(tooling_dir):
-            shutil.rmtree(tooling_dir)
-        
-        extensions_dir = os.path.join(OUTPUT_DIR, "extensions")
-        if os.path.exists(extensions_dir):
-            shutil.rmtree(extensions_dir)
-
-        # 4.5. Clean non-Rust files
-        print("Cleaning non-Rust files...")
-        dirs_to_remove = [
-            ".cargo", ".cloudflare", ".config", ".factory", ".github", ".zed", 
-            "ci", "docs", "legal", "nix", "script", "assets"
-        ]
-        for d in dirs_to_remove:
-            path = os.path.join(OUTPUT_DIR, d)
-            if os.path.exists(path):
-                if os.path.isdir(path):
-                    shutil.rmtree(path)
-                else:
-                    os.remove(path)
-                
+        # Enumerate with git instead of walking the tree; -s exposes symlinks as mode 120000.
+        # This must run before step 4 deletes .git.
+        tracked = run_git(
+            "-C", OUTPUT_DIR, "ls-files", "-z", "-s", "crates/",
+            capture_output=True,
+            check=True
+        ).stdout
+        output_root = os.fsencode(OUTPUT_DIR)
+        needed_crate_names = {os.fsencode(c) for c in needed_crates}
+        gpui_prefix = b"crates/gpui/"
+        # Directory deletions for steps 3 and 4 are collected and run as one concurrent batch
+        stale_dirs = set()
+
+        for record in tracked.split(b"\0"):
+            if not record:
+                continue
+            meta, rel_path = record.split(b"\t", 1)
+            parts = rel_path.split(b"/")
+            if len(parts) > 2 and parts[1] not in needed_crate_names:
+                continue
+
+            if b"docs" in parts[:-1]:
+                docs_dir = b"/".join(parts[:parts.index(b"docs") + 1])
+                stale_dirs.add(os.fsdecode(os.path.join(output_root, docs_dir)))
+                continue
+
+            file_path = os.path.join(output_root, rel_path)
+
+            # Check for symlinks; directory symlinks are kept and their contents get
+            # copied into the upload repo, as os.walk listed them under dirs, not files
+            if meta.startswith(b"120000"):
+                if not os.path.isdir(file_path):
+                    try:
+                        os.unlink(file_path)
+                    except OSError:
+                        pass
+                continue
+
+            # Special case: gpui needs its README.md for compilation
+            if rel_path.startswith(gpui_prefix) and parts[-1].lower() == b"readme.md":
+                continue
+
+            if PRUNE_FILE_RE.match(parts[-1]):
+                try:
+                    os.unlink(file_path)
+                except OSError:
+                    pass
+
+        # 4. Clean unneeded crates, tooling, extensions and non-Rust files in a single pass
+        print("Cleaning unneeded crates and non-Rust files...")
         files_to_keep = {
             "Cargo.toml", "Cargo.lock", "clippy.toml", "rust-toolchain.toml", "crates", "target", ".gitignore"
         }
-        
-        for f in os.listdir(OUTPUT_DIR):
-            path = os.path.join(OUTPUT_DIR, f)
-            
-            # Remove symbolic links in root
-            if os.path.islink(path):
-                print(f"Removing symbolic link: {f}")
-                os.remove(path)
-                continue
 
-            if f not in files_to_keep:
-                if os.path.isfile(path):
-                    os.remove(path)
-                elif os.path.isdir(path):
-                    shutil.rmtree(path)
+        with os.scandir(OUTPUT_DIR) as entries:
+            for entry in entries:
+                # Remove symbolic links in root
+                if entry.is_symlink():
+                    print(f"Removing symbolic link: {entry.name}")
+                    os.remove(entry.path)
+                    continue
 
-        # 4.6. Stub util_macros (remove perf dependency)
+                if entry.name == "crates":
+                    with os.scandir(entry.path) as crate_entries:
+                        for crate_entry in crate_entries:
+                            if crate_entry.is_dir(follow_symlinks=False) and crate_entry.name not in needed_crates:
+                                stale_dirs.add(crate_entry.path)
+                elif entry.name not in files_to_keep:
+                    if entry.is_dir(follow_symlinks=False):
+                        stale_dirs.add(entry.path)
+                    else:
+                        os.remove(entry.path)
+
+        remove_trees(stale_dirs)
+
+        # 5. Stub util_macros (remove perf dependency)
         print("Stubbing util_macros...")
         util_macros_cargo = os.path.join(OUTPUT_DIR, "crates/util_macros/Cargo.toml")
         if os.path.exists(util_macros_cargo):
@@ -224,10 +359,11 @@ def main():
                 
         util_macros_src = os.path.join(OUTPUT_DIR, "crates/util_macros/src/util_macros.rs")
         if os.path.exists(util_macros_src):
-            with open(util_macros_src, "r") as f:
+            # Binary mode throughout: a plain byte substitution needs no decode/encode
+            with open(util_macros_src, "rb") as f:
                 content = f.read()
             
-            stub_code = """
+            stub_code = b"""
 mod perf {
     #[derive(Default, Clone, Copy, Debug)]
     pub enum Importance { Critical, Important, #[default] Average, Iffy, Fluff }
@@ -251,30 +387,35 @@ mod perf {
 }
 use perf::*;
 """
-            content = content.replace("use perf::*;", stub_code)
-            with open(util_macros_src, "w") as f:
+            content = content.replace(b"use perf::*;", stub_code)
+            with open(util_macros_src, "wb") as f:
                 f.write(content)
 
-        # 5. Fix root Cargo.toml
+        # 6. Fix root Cargo.toml
         print("Updating Cargo.toml...")
         
         if "default-members" in root_cargo["workspace"]:
             root_cargo["workspace"]["default-members"] = ["crates/gpui"]
             
+        # Stat each workspace member once; dependency and profile checks reuse the result
+        existing_members = {
+            member
+            for member in root_cargo["workspace"].get("members", [])
+            if os.path.isdir(os.path.join(OUTPUT_DIR, member))
+        }
+
         if "members" in root_cargo["workspace"]:
-            new_members = []
-            for member in root_cargo["workspace"]["members"]:
-                if os.path.exists(os.path.join(OUTPUT_DIR, member)):
-                    new_members.append(member)
-            root_cargo["workspace"]["members"] = new_members
+            root_cargo["workspace"]["members"] = [
+                member for member in root_cargo["workspace"]["members"] if member in existing_members
+            ]
 
         if "dependencies" in root_cargo["workspace"]:
             new_deps = {}
             for name, defn in root_cargo["workspace"]["dependencies"].items():
                 keep = True
                 if isinstance(defn, dict) and "path" in defn:
-                    full_path = os.path.join(OUTPUT_DIR, defn["path"])
-                    if not os.path.exists(full_path):
+                    path = defn["path"]
+                    if path not in existing_members and not os.path.exists(os.path.join(OUTPUT_DIR, path)):
                         keep = False
                 
                 if keep:
@@ -282,31 +423,35 @@ use perf::*;
             root_cargo["workspace"]["dependencies"] = new_deps
 
         if "profile" in root_cargo:
+            member_basenames = {member.rsplit("/", 1)[-1] for member in existing_members}
             for profile_name in root_cargo["profile"]:
                 profile = root_cargo["profile"][profile_name]
                 if isinstance(profile, dict) and "package" in profile:
-                    new_package_overrides = {}
-                    for pkg_name, pkg_defn in profile["package"].items():
-                        exists = False
-                        for member in root_cargo["workspace"]["members"]:
-                            if member.endswith("/" + pkg_name) or member == pkg_name:
-                                exists = True
-                                break
-                        if exists:
-                            new_package_overrides[pkg_name] = pkg_defn
-                    
-                    profile["package"] = new_package_overrides
+                    profile["package"] = {
+                        pkg_name: pkg_defn
+                        for pkg_name, pkg_defn in profile["package"].items()
+                        if pkg_name in member_basenames
+                    }
 
         write_toml(root_cargo_path, root_cargo)
 
-        # 6. Build
+        # 7. Verify the pruned workspace compiles (check skips codegen and linking)
         if shutil.which("cargo"):
-            print("Building gpui...")
-            subprocess.run(["cargo", "build", "-p", "gpui"], check=True, cwd=OUTPUT_DIR)
+            print("Checking gpui...")
+            # Keep target/ outside the temporary workspace so successive runs reuse it.
+            # Incremental is forced on after os.environ: CI toolchain setup exports
+            # CARGO_INCREMENTAL=0, which would defeat the persistent target dir.
+            cargo_env = {
+                "CARGO_NET_GIT_FETCH_WITH_CLI": "true",
+                "CARGO_TARGET_DIR": DEFAULT_CARGO_TARGET_DIR,
+                **os.environ,
+                "CARGO_INCREMENTAL": "1",
+            }
+            subprocess.run(["cargo", "check", "-p", "gpui"], check=True, cwd=OUTPUT_DIR, env=cargo_env)
         else:
-            print("Cargo not found, skipping build.")
+            print("Cargo not found, skipping check.")
 
-        # 7. Sync to upload/gpui-clone
+        # 8. Sync to upload/gpui-clone
         repo_url = "https://github.com/rain2307/gpui-clone.git"
 
         # Ensure upload parent directory exists (inside temp)
@@ -314,91 +459,63 @@ use perf::*;
 
         print(f"Cloning {repo_url} into {UPLOAD_DIR}...")
         try:
-            subprocess.run(["git", "clone", repo_url, UPLOAD_DIR], check=True)
+            # Only the tip is needed to commit one new snapshot on top of it
+            run_git(
+                "clone", "--depth=1", "--single-branch", "--no-tags", repo_url, UPLOAD_DIR,
+                check=True,
+            )
+            # index.version only applies to newly created indexes, so convert the
+            # clone's v2 index to the smaller v4 format explicitly
+            run_git("-C", UPLOAD_DIR, "update-index", "--index-version", "4", check=True)
         except subprocess.CalledProcessError as e:
             print(f"Failed to clone repository: {e}")
             return
 
         if os.path.exists(UPLOAD_DIR) and os.path.isdir(UPLOAD_DIR):
             print(f"Syncing to {UPLOAD_DIR}...")
-            
-            # Get source commit hash
-            try:
-                result = subprocess.run(
-                    ["git", "rev-parse", "--short", "HEAD"], 
-                    cwd=SOURCE_DIR, 
-                    capture_output=True, 
-                    text=True, 
-                    check=True
-                )
-                source_commit = result.stdout.strip()
-            except subprocess.CalledProcessError:
-                source_commit = "unknown"
-                print("Warning: Could not get source commit hash.")
 
             # Sync files
-            # Remove files in UPLOAD_DIR that are not in OUTPUT_DIR (except .git and .github)
-            for root, dirs, files in os.walk(UPLOAD_DIR):
-                path_parts = root.split(os.sep)
-                if ".git" in path_parts or ".github" in path_parts:
-                    continue
-                
-                # Remove files
-                for f in files:
-                    if f == ".git": continue
-                    
-                    rel_path = os.path.relpath(os.path.join(root, f), UPLOAD_DIR)
-                    
-                    # Skip README.md in the root
-                    if rel_path.lower() == "readme.md":
-                        continue
-
-                    # Skip .github directory content
-                    if rel_path.startswith(".github"):
-                        continue
-
-                    src_path = os.path.join(OUTPUT_DIR, rel_path)
-                    
-                    if not os.path.exists(src_path):
-                        os.remove(os.path.join(root, f))
-                
-                # Remove directories
-                for d in dirs:
-                    if d == ".git": continue
-                    
-                    rel_path = os.path.relpath(os.path.join(root, d), UPLOAD_DIR)
-                    if rel_path.startswith(".github"): continue
-                    
-                    src_path = os.path.join(OUTPUT_DIR, rel_path)
-                    
-                    if not os.path.exists(src_path):
-                        shutil.rmtree(os.path.join(root, d))
+            if shutil.which("rsync"):
+                # rsync diffs both trees in one process; excluded paths are also protected
+                # from --delete. Both trees are fresh checkouts with unrelated mtimes, so
+                # compare by content (--checksum) and leave the mtimes of unchanged files
+                # alone (--no-times): their index stat data stays valid and git add skips them.
+                subprocess.run(
+                    [
+                        "rsync", "-a", "--no-times", "--checksum", "--copy-links", "--delete",
+                        "--exclude=.git", "--exclude=/.github", "--exclude=/README.md",
+                        OUTPUT_DIR + "/", UPLOAD_DIR + "/",
+                    ],
+                    check=True,
+                )
+            else:
+                # Remove files in UPLOAD_DIR that are not in OUTPUT_DIR (except .git and .github)
+                remove_stale_paths(OUTPUT_DIR, UPLOAD_DIR)
 
-            # Copy files from OUTPUT_DIR to UPLOAD_DIR
-            robust_copy_tree(OUTPUT_DIR, UPLOAD_DIR)
+                # Copy files from OUTPUT_DIR to UPLOAD_DIR
+                robust_copy_tree(OUTPUT_DIR, UPLOAD_DIR)
 
             # Git operations
             print("Committing changes...")
             try:
-                subprocess.run(["git", "add", "."], cwd=UPLOAD_DIR, check=True)
+                run_git(*MANY_FILES_CONFIG, "-C", UPLOAD_DIR, "add", "-A", ".", check=True)
                 
                 # Check for changes
-                status = subprocess.run(
-                    ["git", "status", "--porcelain"], 
-                    cwd=UPLOAD_DIR, 
+                # Raw NUL-separated bytes; only emptiness matters, so skip decoding
+                status = run_git(
+                    *MANY_FILES_CONFIG, "-C", UPLOAD_DIR, "status", "--porcelain", "-z", "--no-renames",
                     capture_output=True, 
-                    text=True, 
                     check=True
                 )
                 
                 if status.stdout.strip():
                     commit_msg = f"Sync with zed commit: {source_commit}"
-                    subprocess.run(["git", "commit", "-m", commit_msg], cwd=UPLOAD_DIR, check=True)
+                    run_git("-C", UPLOAD_DIR, "commit", "-m", commit_msg, check=True)
                     print(f"Committed changes with message: {commit_msg}")
                     
                     # Push changes
                     print("Pushing changes...")
-                    subprocess.run(["git", "push"], cwd=UPLOAD_DIR, check=True)
+                    run_git("-C", UPLOAD_DIR, "push", "origin", "HEAD", check=True)
                 else:
                     print("No changes to commit.")
                     